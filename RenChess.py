@@ -36,18 +36,20 @@ col is the same as in PySimpleGUI
 """
 
 import PySimpleGUI as sg
+import atexit
 import subprocess
 import threading
 from pathlib import Path, PurePath  # Python 3.4 and up
 import queue
-import copy
+import re
+import mmap
+import shutil
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import json
-import pyperclip
 import chess.pgn
 import chess.engine
-import chess.polyglot
 
 from globals import *
 from engine import RunEngine
@@ -56,6 +58,81 @@ from user import User
 import chessGame
 import chessPuzzle
 
+BOOK_HEADER = '{:4s}   {:<5s}   {}\n'.format('move', 'score', 'weight')
+BOOK_NO_FILE_HEADER = '{:4s}  {:<}\n'.format('move', 'score')
+SPIN_OVERRIDES = {'threads': 1, 'hash': 32}  # Engine spin option values
+PROGRESS_GAME_STEP = 500  # Send progress after this number of games
+PROGRESS_INTERVAL_SEC = 0.1  # or after this time since the last progress
+ENGINE_EXCLUDE_EXT = frozenset({'.gz', '.dll', '.bin', '.dat'})  # Not engines
+CLEAR_KEYS = ('search_info_all_k', 'polyglot_book1_k', 'polyglot_book2_k',
+              'advise_info_k', 'comment_k', 'w_base_time_k', 'b_base_time_k',
+              'w_elapse_k', 'b_elapse_k')  # Text boxes cleared on new game
+ENGINE_ID_TIMEOUT_SEC = 10  # Max time for engine to answer uci and quit
+PGN_TAG_LINE_RE = re.compile(
+        rb'^\[([A-Za-z0-9_]+)\s+"((?:[^"\\]|\\.)*)"[^\n]*\n?',
+        re.M)  # One whole pgn tag line, name and value
+PLAYER_TAGS = (b'White', b'Black')  # Tags holding player names
+
+
+@lru_cache(maxsize=4096)
+def format_mm_ss(time_s):
+    """
+    Returns time in mm:ss format, the clock only changes every second so
+    the formatted strings are cached.
+
+    :param time_s: time in seconds
+    :return:
+    """
+    m, s = divmod(time_s, 60)
+    return f'{m:02d}m:{s:02d}s'
+
+
+@lru_cache(maxsize=4096)
+def format_h_mm_ss(time_s, symbol=True):
+    """
+    Returns time in h:mm:ss format.
+
+    :param time_s: time in seconds
+    :param symbol: add h, m and s after the numbers
+    :return:
+    """
+    m, s = divmod(time_s, 60)
+    h, m = divmod(m, 60)
+
+    if not symbol:
+        return f'{h:01d}:{m:02d}:{s:02d}'
+    return f'{h:01d}h:{m:02d}m:{s:02d}s'
+
+
+book_readers = {}
+
+
+def open_book(book_file):
+    """
+    Returns polyglot reader of book_file. The book is memory mapped once
+    and the reader is reused until the app exits.
+
+    :param book_file: polyglot book filename
+    :return: chess.polyglot.MemoryMappedReader
+    """
+    reader = book_readers.get(book_file)
+    if reader is None:
+        # Only needed once a book is used, not at gui start
+        import chess.polyglot
+        reader = chess.polyglot.open_reader(book_file)
+        book_readers[book_file] = reader
+
+    return reader
+
+
+@atexit.register
+def close_books():
+    """ Close all polyglot readers opened by open_book() """
+    for reader in book_readers.values():
+        reader.close()
+    book_readers.clear()
+
+
 class Timer:
     def __init__(self, tc_type='fischer', base=300000, inc=10000,
                  period_moves=40):
@@ -107,7 +184,7 @@ class GuiBook:
 
     def get_book_move(self):
         """ Returns book move either random or best move """
-        reader = chess.polyglot.open_reader(self.book_file)
+        reader = open_book(self.book_file)
         try:
             if self.is_random:
                 entry = reader.weighted_choice(self.board)
@@ -118,8 +195,6 @@ class GuiBook:
             logging.warning('No more book move.')
         except Exception:
             logging.exception('Failed to get book move.')
-        finally:
-            reader.close()
 
         return self.__book_move
 
@@ -129,35 +204,22 @@ class GuiBook:
 
         :return: move string
         """
-        is_found = False
-        total_score = 0
-        book_data = {}
-        cnt = 0
-
-        if os.path.isfile(self.book_file):
-            moves = '{:4s}   {:<5s}   {}\n'.format('move', 'score', 'weight')
-            with chess.polyglot.open_reader(self.book_file) as reader:
-                for entry in reader.find_all(self.board):
-                    is_found = True
-                    san_move = self.board.san(entry.move)
-                    score = entry.weight
-                    total_score += score
-                    bd = {cnt: {'move': san_move, 'score': score}}
-                    book_data.update(bd)
-                    cnt += 1
-        else:
-            moves = '{:4s}  {:<}\n'.format('move', 'score')
+        if not os.path.isfile(self.book_file):
+            return BOOK_NO_FILE_HEADER, False
+
+        reader = open_book(self.book_file)
+        book_data = [(self.board.san(entry.move), entry.weight)
+                     for entry in reader.find_all(self.board)]
 
         # Get weight for each move
-        if is_found:
-            for _, v in book_data.items():
-                move = v['move']
-                score = v['score']
-                weight = score/total_score
-                moves += '{:4s}   {:<5d}   {:<2.1f}%\n'.format(move, score,
-                                                            100*weight)
+        total_score = sum(score for _, score in book_data) or 1
+        lines = [BOOK_HEADER]
+        lines.extend('{:4s}   {:<5d}   {:<2.1f}%\n'.format(
+                         move, score, 100*score/total_score)
+                     for move, score in book_data)
+        moves = ''.join(lines)
 
-        return moves, is_found
+        return moves, bool(book_data)
 
 
 class RenChessApp:
@@ -170,7 +232,15 @@ class RenChessApp:
                  max_depth=MAX_DEPTH):
         self.theme = theme
         self.user_config_file = user_config_file
+        self._user_cfg = None
+        self._user_cfg_mtime = None
         self.engine_config_file = engine_config_file
+        self._engine_cfg_cache = None
+        self._engine_cfg_mtime = None
+        self._engine_by_name = {}
+        self._engine_opt_index = {}
+        self._engine_files = None
+        self._engine_files_mtime = None
         self.gui_book_file = gui_book_file
         self.computer_book_file = computer_book_file
         self.human_book_file = human_book_file
@@ -188,6 +258,8 @@ class RenChessApp:
         self.adviser_threads = 1
         self.adviser_movetime_sec = 10
         self.pecg_auto_save_game = 'pecg_auto_save_games.pgn'
+        self._tag_date_day = None
+        self._tag_date = None
         self.my_games = 'pecg_my_games.pgn'
         self.repertoire_file = {'white': 'pecg_white_repertoire.pgn', 'black': 'pecg_black_repertoire.pgn'}
         self.init_game()        
@@ -223,43 +295,21 @@ class RenChessApp:
         :param user_comment: Can be a 'book' from the engine
         :return:
         """
-        # Save user comment
-        if self.is_save_user_comment:
-            # If comment is empty
-            if not (user_comment and user_comment.strip()):
-                if mc == 1:
-                    self.node = self.game.add_variation(user_move)
-                else:
-                    self.node = self.node.add_variation(user_move)
-
-                # Save clock (time left after a move) as move comment
-                if self.is_save_time_left:
-                    rem_time = self.get_time_h_mm_ss(time_left, False)
-                    self.node.comment = '[%clk {}]'.format(rem_time)
-            else:
-                if mc == 1:
-                    self.node = self.game.add_variation(user_move)
-                else:
-                    self.node = self.node.add_variation(user_move)
-
-                # Save clock, add clock as comment after a move
-                if self.is_save_time_left:
-                    rem_time = self.get_time_h_mm_ss(time_left, False)
-                    self.node.comment = '[%clk {}] {}'.format(rem_time,
-                                                         user_comment)
-                else:
-                    self.node.comment = user_comment
-        # Do not save user comment
-        else:
-            if mc == 1:
-                self.node = self.game.add_variation(user_move)
-            else:
-                self.node = self.node.add_variation(user_move)
-
-            # Save clock, add clock as comment after a move
-            if self.is_save_time_left:
-                rem_time = self.get_time_h_mm_ss(time_left, False)
-                self.node.comment = '[%clk {}]'.format(rem_time)
+        parent = self.game if mc == 1 else self.node
+        self.node = parent.add_variation(user_move)
+
+        # Save clock (time left after a move) as move comment
+        clk = None
+        if self.is_save_time_left:
+            rem_time = self.get_time_h_mm_ss(time_left, False)
+            clk = f'[%clk {rem_time}]'
+
+        # Save user comment if it is not empty, after the clock if any
+        if self.is_save_user_comment and user_comment and user_comment.strip():
+            self.node.comment = user_comment if clk is None else \
+                    f'{clk} {user_comment}'
+        elif clk is not None:
+            self.node.comment = clk
 
     def delete_player(self, name, pgn, que):
         """
@@ -270,7 +320,7 @@ class RenChessApp:
         :param que:
         :return:
         """
-        logging.info(f'Enters delete_player()')
+        logging.info('Enters delete_player()')
 
         pgn_path = Path(pgn)
         folder_path = pgn_path.parents[0]
@@ -281,38 +331,53 @@ class RenChessApp:
         # Create backup of orig
         backup = pgn_file + '.backup'
         backup_path = Path(folder_path, backup)
-        backup_path.touch()
-        origfile_text = Path(pgn).read_text()
-        backup_path.write_text(origfile_text)
-        logging.info(f'backup copy {backup_path} is successfully created.')
+        try:
+            shutil.copyfile(pgn_path, backup_path)
+        except OSError:
+            # Games are not deleted when there is no backup of them
+            logging.exception('Failed to create backup copy %s.', backup_path)
+            que.put('Done')
+            return
+        logging.info('backup copy %s is successfully created.', backup_path)
 
         # Define output file
         output = 'out_' + pgn_file
         output_path = Path(folder_path, output)
-        logging.info(f'output {output_path} is successfully created.')
+        logging.info('output %s is successfully created.', output_path)
 
-        logging.info(f'Deleting player {name}.')
+        logging.info('Deleting player %s.', name)
         gcnt = 0
+        last_update = time.monotonic()
+
+        # read pgn headers only and copy the text of each game if player name
+        # to be deleted is not in the game, either white or black.
+        with open(output_path, 'a', buffering=1 << 20) as f:
+            with open(pgn_path) as h, open(pgn_path) as src:
+                while True:
+                    start = h.tell()
+                    headers = chess.pgn.read_headers(h)
+                    if headers is None:
+                        break
+                    end = h.tell()
 
-        # read pgn and save each game if player name to be deleted is not in
-        # the game, either white or black.
-        with open(output_path, 'a') as f:
-            with open(pgn_path) as h:
-                game = chess.pgn.read_game(h)
-                while game:
                     gcnt += 1
-                    que.put('Delete, {}, processing game {}'.format(
-                        name, gcnt))
-                    wp = game.headers['White']
-                    bp = game.headers['Black']
+
+                    # Throttle progress messages to the gui
+                    now = time.monotonic()
+                    if gcnt % PROGRESS_GAME_STEP == 0 or \
+                            now - last_update > PROGRESS_INTERVAL_SEC:
+                        que.put(f'Delete, {name}, processing game {gcnt}')
+                        last_update = now
+
+                    wp = headers.get('White', '?')
+                    bp = headers.get('Black', '?')
 
                     # If this game has no player with name to be deleted
                     if wp != name and bp != name:
-                        f.write('{}\n\n'.format(game))
-                    game = chess.pgn.read_game(h)
+                        self.copy_pgn_text(src, start, end, f)
 
         if output_path.exists():
-            logging.info('Deleting player {} is successful.'.format(name))
+            logging.info('Deleting player %s is successful.', name)
 
             # Delete the orig file and rename the current output to orig file
             pgn_path.unlink()
@@ -322,69 +387,194 @@ class RenChessApp:
 
         que.put('Done')
 
-    def get_players(self, pgn, q):
-        logging.info(f'Enters get_players()')
-        players = []
-        games = 0
-        with open(pgn) as h:
-            while True:
-                headers = chess.pgn.read_headers(h)
-                if headers is None:
-                    break
+    def copy_pgn_text(self, src, start, end, f):
+        """
+        Copy the text of a game from src to f without parsing it again. The
+        game is always followed by an empty line in f.
 
-                wp = headers['White']
-                bp = headers['Black']
+        :param src: pgn file handle
+        :param start: position of the game, from src.tell()
+        :param end: position after the game, from src.tell()
+        :param f: output file handle
+        :return:
+        """
+        line = ''
+        src.seek(start)
+        while src.tell() != end:
+            line = src.readline()
+            if not line:
+                break
+            f.write(line)
 
-                players.append(wp)
-                players.append(bp)
-                games += 1
+        if not line.endswith('\n'):
+            f.write('\n')
+        if line.strip():
+            f.write('\n')
 
-        p = list(set(players))
-        ret = [p, games]
+    def get_players(self, pgn, q):
+        """
+        Send the players and number of games in pgn thru q. Tag lines are
+        scanned directly from the mapped file, games are not parsed. A game
+        is counted at the start of each tag section, so a game without any
+        tags is not counted.
+        """
+        logging.info('Enters get_players()')
+        players = set()
+        games = 0
+        with open(pgn, 'rb') as h:
+            if os.fstat(h.fileno()).st_size:
+                with mmap.mmap(h.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    section_end = -1
+                    for m in PGN_TAG_LINE_RE.finditer(mm):
+                        # A tag line right after another one is the same game
+                        if m.start() != section_end:
+                            games += 1
+                        section_end = m.end()
+                        if m.group(1) in PLAYER_TAGS:
+                            players.add(m.group(2).decode('utf-8', 'replace'))
+
+        ret = [list(players), games]
 
         q.put(ret)
 
     def get_engine_id_name(self, path_and_file, q):
-        """ Returns id name of uci engine """
+        """
+        Returns id name of uci engine. Only the uci handshake is needed for
+        the id name, so the engine is run directly instead of thru
+        python-chess.
+        """
         id_name = None
         folder = Path(path_and_file)
         folder = folder.parents[0]
 
         try:
             if platform == 'win32':
-                engine = chess.engine.SimpleEngine.popen_uci(
-                    path_and_file, cwd=folder,
+                p = subprocess.Popen(
+                    [path_and_file], cwd=folder, stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
                     creationflags=subprocess.CREATE_NO_WINDOW)
             else:
-                engine = chess.engine.SimpleEngine.popen_uci(
-                    path_and_file, cwd=folder)
-            id_name = engine.id['name']
-            engine.quit()
+                p = subprocess.Popen(
+                    [path_and_file], cwd=folder, stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+            # Kill the engine if it does not answer uci in time, that also
+            # ends the read loop below.
+            is_uciok = False
+            timer = threading.Timer(ENGINE_ID_TIMEOUT_SEC, p.kill)
+            timer.start()
+            try:
+                p.stdin.write(b'uci\n')
+                p.stdin.flush()
+                for raw_line in p.stdout:
+                    # Engine output is not always valid utf-8
+                    line = raw_line.decode(errors='replace').strip()
+                    if line.startswith('id name ') and id_name is None:
+                        id_name = line[len('id name '):].strip()
+                    elif line == 'uciok':
+                        is_uciok = True
+                        break
+            finally:
+                timer.cancel()
+
+            if not is_uciok:
+                logging.warning('Engine %s does not answer uci.',
+                                path_and_file)
+                p.kill()
+                p.wait()
+            else:
+                # quit is sent only after uciok
+                try:
+                    p.stdin.write(b'quit\n')
+                    p.stdin.close()
+                    p.wait(timeout=ENGINE_ID_TIMEOUT_SEC)
+                except (OSError, subprocess.TimeoutExpired):
+                    logging.warning('Engine %s does not quit.', path_and_file)
+                    p.kill()
+                    p.wait()
+            p.stdout.close()
         except Exception:
             logging.exception('Failed to get id name.')
 
         q.put(['Done', id_name])
 
+    def _load_engine_cfg(self):
+        """
+        Returns the parsed engine config file. The file is only read and
+        parsed again when its modification time has changed.
+
+        :return: list of engine entries from pecg_engines.json
+        """
+        mtime = os.stat(self.engine_config_file).st_mtime_ns
+        if self._engine_cfg_cache is None or mtime != self._engine_cfg_mtime:
+            self._engine_cfg_cache = load_json_file(self.engine_config_file)
+            self._engine_cfg_mtime = mtime
+            self._build_engine_index(self._engine_cfg_cache)
+
+        return self._engine_cfg_cache
+
+    def _build_engine_index(self, data):
+        """
+        Index engine entries by id name and their options by lower case
+        option name, the first entry of a given name is kept.
+
+        :param data: list of engine entries from pecg_engines.json
+        :return:
+        """
+        self._engine_by_name = {}
+        self._engine_opt_index = {}
+        for p in data:
+            if p['name'] in self._engine_by_name:
+                continue
+            self._engine_by_name[p['name']] = p
+            if 'options' in p:
+                self._engine_opt_index[p['name']] = {
+                    n['name'].lower(): n for n in p['options']}
+
+    def _get_engine_entry(self, eng_id_name):
+        """ Returns engine entry of eng_id_name or None """
+        self._load_engine_cfg()
+        return self._engine_by_name.get(eng_id_name)
+
+    def _get_engine_option_value(self, eng_id_name, opt_name):
+        """
+        Returns the user value of option opt_name of engine eng_id_name.
+
+        :param eng_id_name: the engine id name
+        :param opt_name: lower case option name, i.e hash or threads
+        :return: option value or None
+        """
+        if self._get_engine_entry(eng_id_name) is None:
+            return None
+
+        opt_index = self._engine_opt_index.get(eng_id_name)
+
+        # There engines without options
+        if opt_index is None:
+            logging.info('This engine %s has no options.', eng_id_name)
+            return None
+
+        opt = opt_index.get(opt_name)
+        return None if opt is None else opt['value']
+
+    def _save_engine_cfg(self, data):
+        """
+        Save data to engine config file. It is written to a temp file first
+        and renamed, so a crash never leaves a half written config. The
+        saved data becomes the cache.
+        """
+        tmp_file = self.engine_config_file + '.tmp'
+        with open(tmp_file, 'w', buffering=1 << 16) as h:
+            json.dump(data, h, indent=4)
+        os.replace(tmp_file, self.engine_config_file)
+
+        self._engine_cfg_cache = data
+        self._engine_cfg_mtime = os.stat(self.engine_config_file).st_mtime_ns
+        self._build_engine_index(data)
+
     def get_engine_hash(self, eng_id_name):
         """ Returns hash value from engine config file """
-        eng_hash = None
-        with open(self.engine_config_file, 'r') as json_file:
-            data = json.load(json_file)
-            for p in data:
-                if p['name'] == eng_id_name:
-                    # There engines without options
-                    try:
-                        for n in p['options']:
-                            if n['name'].lower() == 'hash':
-                                return n['value']
-                    except KeyError:
-                        logging.info('This engine {} has no options.'.format(
-                            eng_id_name))
-                        break
-                    except Exception:
-                        logging.exception('Failed to get engine hash.')
-
-        return eng_hash
+        return self._get_engine_option_value(eng_id_name, 'hash')
 
     def get_engine_threads(self, eng_id_name):
         """
@@ -393,23 +583,7 @@ class RenChessApp:
         :param eng_id_name: the engine id name
         :return: number of threads
         """
-        eng_threads = None
-        with open(self.engine_config_file, 'r') as json_file:
-            data = json.load(json_file)
-            for p in data:
-                if p['name'] == eng_id_name:
-                    try:
-                        for n in p['options']:
-                            if n['name'].lower() == 'threads':
-                                return n['value']
-                    except KeyError:
-                        logging.info('This engine {} has no options.'.format(
-                            eng_id_name))
-                        break
-                    except Exception:
-                        logging.exception('Failed to get engine threads.')
-
-        return eng_threads
+        return self._get_engine_option_value(eng_id_name, 'threads')
 
     def get_engine_file(self, eng_id_name):
         """
@@ -419,14 +593,11 @@ class RenChessApp:
         :return: engine file and its path
         """
         eng_file, eng_path_and_file = None, None
-        with open(self.engine_config_file, 'r') as json_file:
-            data = json.load(json_file)
-            for p in data:
-                if p['name'] == eng_id_name:
-                    eng_file = p['command']
-                    eng_path_and_file = Path(p['workingDirectory'],
-                                             eng_file).as_posix()
-                    break
+        p = self._get_engine_entry(eng_id_name)
+        if p is not None:
+            eng_file = p['command']
+            eng_path_and_file = Path(p['workingDirectory'],
+                                     eng_file).as_posix()
 
         return eng_file, eng_path_and_file
 
@@ -437,38 +608,49 @@ class RenChessApp:
         :return: list of engine id names
         """
         eng_id_name_list = []
-        with open(self.engine_config_file, 'r') as json_file:
-            data = json.load(json_file)
-            for p in data:
-                if p['protocol'] == 'uci':
-                    eng_id_name_list.append(p['name'])
+        for p in self._load_engine_cfg():
+            if p['protocol'] == 'uci':
+                eng_id_name_list.append(p['name'])
 
         eng_id_name_list = sorted(eng_id_name_list)
 
         return eng_id_name_list
 
+    def _load_user_cfg(self):
+        """
+        Returns the parsed user config file. The file is only read and
+        parsed again when its modification time has changed.
+
+        :return: list of users from pecg_user.json
+        """
+        mtime = os.stat(self.user_config_file).st_mtime_ns
+        if self._user_cfg is None or mtime != self._user_cfg_mtime:
+            self._user_cfg = load_json_file(self.user_config_file)
+            self._user_cfg_mtime = mtime
+
+        return self._user_cfg
+
+    def _save_user_cfg(self, data):
+        """ Save data to user config file and invalidate the cache """
+        with open(self.user_config_file, 'w') as h:
+            json.dump(data, h, indent=4)
+        self._user_cfg = None
+        self._user_cfg_mtime = None
+
     def update_user_config_file(self, username):
         """
         Update user config file. If username does not exist, save it.
         :param username:
         :return:
         """
-        with open(self.user_config_file, 'r') as json_file:
-            data = json.load(json_file)
+        data = self._load_user_cfg()
 
         # Add the new entry if it does not exist
-        is_name = False
-        for i in range(len(data)):
-            if data[i]['username'] == username:
-                is_name = True
-                break
-
-        if not is_name:
+        if not any(p['username'] == username for p in data):
             data.append({'username': username})
 
             # Save
-            with open(self.user_config_file, 'w') as h:
-                json.dump(data, h, indent=4)
+            self._save_user_cfg(data)
 
     def check_user_config_file(self):
         """
@@ -479,19 +661,17 @@ class RenChessApp:
         """
         user_config_file_path = Path(self.user_config_file)
         if user_config_file_path.exists():
-            with open(self.user_config_file, 'r') as json_file:
-                data = json.load(json_file)
-                for p in data:
-                    username = p['username']
-            self.username = username
+            # The last user in the file is the current user
+            data = self._load_user_cfg()
+            if data:
+                self.username = data[-1]['username']
         else:
             # Write a new user config file
             data = []
             data.append({'username': 'Human'})
 
             # Save data to pecg_user.json
-            with open(self.user_config_file, 'w') as h:
-                json.dump(data, h, indent=4)
+            self._save_user_cfg(data)
 
     def update_engine_to_config_file(self, eng_path_file, new_name, old_name, user_opt):
         """
@@ -511,36 +691,28 @@ class RenChessApp:
         file = PurePath(eng_path_file)
         file = file.name
 
-        with open(self.engine_config_file, 'r') as json_file:
-            data = json.load(json_file)
+        data = self._load_engine_cfg()
 
-        for p in data:
-            command = p['command']
-            work_dir = p['workingDirectory']
-
-            if file == command and folder == work_dir and old_name == p['name']:
-                p['name'] = new_name
-                for k, v in p.items():
-                    if k == 'options':
-                        for d in v:
-                            # d = {'name': 'Ponder', 'default': False,
-                            # 'value': False, 'type': 'check'}
-                            
-                            default_type = type(d['default'])                            
-                            opt_name = d['name']
-                            opt_value = d['value']
-                            for u in user_opt:
-                                # u = {'name': 'CDrill 1400'}
-                                for k1, v1 in u.items():
-                                    if k1 == opt_name:
-                                        v1 = int(v1) if default_type == int else v1
-                                        if v1 != opt_value:
-                                            d['value'] = v1
-                break
+        # u = {'name': 'CDrill 1400'}
+        user_values = {k1: v1 for u in user_opt for k1, v1 in u.items()}
+
+        p = self._get_engine_entry(old_name)
+        if p is not None and file == p['command'] and \
+                folder == p['workingDirectory']:
+            p['name'] = new_name
+            for d in p.get('options', []):
+                # d = {'name': 'Ponder', 'default': False,
+                # 'value': False, 'type': 'check'}
+                if d['name'] not in user_values:
+                    continue
+
+                v1 = user_values[d['name']]
+                v1 = int(v1) if type(d['default']) == int else v1
+                if v1 != d['value']:
+                    d['value'] = v1
 
         # Save data to pecg_engines.json
-        with open(self.engine_config_file, 'w') as h:
-            json.dump(data, h, indent=4)
+        self._save_engine_cfg(data)
 
     def is_name_exists(self, name):
         """
@@ -548,15 +720,43 @@ class RenChessApp:
         :param name: The name to check in pecg.engines.json file.
         :return:
         """
-        with open(self.engine_config_file, 'r') as json_file:
-            data = json.load(json_file)
+        return self._get_engine_entry(name) is not None
 
-        for p in data:
-            jname = p['name']
-            if jname == name:
-                return True
+    def _build_option_entries(self, opt_dict):
+        """
+        Returns engine options in pecg_engines.json format. Spin options in
+        SPIN_OVERRIDES get our value instead of the engine default.
 
-        return False
+        :param opt_dict: items of engine.options from python-chess
+        :return: list of option dict
+        """
+        option = []
+        for _, o in opt_dict:
+            if o.type == 'spin':
+                # Adjust hash and threads values
+                value = SPIN_OVERRIDES.get(o.name.lower(), o.default)
+                if value != o.default:
+                    logging.info('config %s is set to %s', o.name, value)
+
+                option.append({'name': o.name,
+                               'default': o.default,
+                               'value': value,
+                               'type': o.type,
+                               'min': o.min,
+                               'max': o.max})
+            elif o.type == 'combo':
+                option.append({'name': o.name,
+                               'default': o.default,
+                               'value': o.default,
+                               'type': o.type,
+                               'choices':o.var})
+            else:
+                option.append({'name': o.name,
+                               'default': o.default,
+                               'value': o.default,
+                               'type': o.type})
+
+        return option
 
     def add_engine_to_config_file(self, engine_path_and_file, pname, que):
         """
@@ -570,10 +770,7 @@ class RenChessApp:
         file = PurePath(engine_path_and_file)
         file = file.name
 
-        option = []
-
-        with open(self.engine_config_file, 'r') as json_file:
-            data = json.load(json_file)
+        data = self._load_engine_cfg()
 
         try:
             if platform == 'win32':
@@ -584,7 +781,7 @@ class RenChessApp:
                 engine = chess.engine.SimpleEngine.popen_uci(
                     engine_path_and_file, cwd=folder)
         except Exception:
-            logging.exception('Failed to add {} in config file.'.format(pname))
+            logging.exception('Failed to add %s in config file.', pname)
             que.put('Failure')
             return
 
@@ -597,39 +794,7 @@ class RenChessApp:
 
         engine.quit()
 
-        for opt in opt_dict:
-            o = opt[1]
-
-            if o.type == 'spin':
-                # Adjust hash and threads values
-                if o.name.lower() == 'threads':
-                    value = 1
-                    logging.info('config {} is set to {}'.format(o.name,
-                                                                 value))
-                elif o.name.lower() == 'hash':
-                    value = 32
-                    logging.info('config {} is set to {}'.format(o.name,
-                                                                 value))
-                else:
-                    value = o.default
-
-                option.append({'name': o.name,
-                               'default': o.default,
-                               'value': value,
-                               'type': o.type,
-                               'min': o.min,
-                               'max': o.max})
-            elif o.type == 'combo':
-                option.append({'name': o.name,
-                               'default': o.default,
-                               'value': o.default,
-                               'type': o.type,
-                               'choices':o.var})
-            else:
-                option.append({'name': o.name,
-                               'default': o.default,
-                               'value': o.default,
-                               'type': o.type})
+        option = self._build_option_entries(opt_dict)
 
         # Save engine filename, working dir, name and options
         wdir = Path(folder).as_posix()
@@ -640,11 +805,49 @@ class RenChessApp:
                      'options': option})
 
         # Save data to pecg_engines.json
-        with open(self.engine_config_file, 'w') as h:
-            json.dump(data, h, indent=4)
+        self._save_engine_cfg(data)
 
         que.put('Success')
 
+    def _probe_engine(self, fn):
+        """
+        Run engine fn from Engines folder and get its id name and options.
+
+        :param fn: engine filename
+        :return: engine entry for pecg_engines.json or None if engine fails
+        """
+        cwd = Path.cwd()
+
+        # cwd=current working dir, engines=folder, fn=exe file
+        epath = Path(cwd, 'Engines', fn)
+        engine_path_and_file = str(epath)
+        folder = epath.parents[0]
+
+        try:
+            if platform == 'win32':
+                engine = chess.engine.SimpleEngine.popen_uci(
+                    engine_path_and_file, cwd=folder,
+                    creationflags=subprocess.CREATE_NO_WINDOW)
+            else:
+                engine = chess.engine.SimpleEngine.popen_uci(
+                    engine_path_and_file, cwd=folder)
+        except Exception:
+            logging.exception('Failed to start engine %s!', fn)
+            return None
+
+        engine_id_name = engine.id['name']
+        opt_dict = engine.options.items()
+        engine.quit()
+
+        option = self._build_option_entries(opt_dict)
+
+        # Save engine filename, working dir, name and options
+        wdir = Path(cwd, 'Engines').as_posix()
+        protocol = 'uci'
+        return {'command': fn, 'workingDirectory': wdir,
+                'name': engine_id_name, 'protocol': protocol,
+                'options': option}
+
     def check_engine_config_file(self):
         """
         Check presence of engine config file pecg_engines.json. If not
@@ -656,86 +859,24 @@ class RenChessApp:
         if ec.exists():
             return
 
-        data = []
-        cwd = Path.cwd()
-
-        self.engine_file_list = self.get_engines()
-
-        for fn in self.engine_file_list:
-            # Run engine and get id name and options
-            option = []
+        engine_files = self.get_engines()
 
-            # cwd=current working dir, engines=folder, fn=exe file
-            epath = Path(cwd, 'Engines', fn)
-            engine_path_and_file = str(epath)
-            folder = epath.parents[0]
-
-            try:
-                if platform == 'win32':
-                    engine = chess.engine.SimpleEngine.popen_uci(
-                        engine_path_and_file, cwd=folder,
-                        creationflags=subprocess.CREATE_NO_WINDOW)
-                else:
-                    engine = chess.engine.SimpleEngine.popen_uci(
-                        engine_path_and_file, cwd=folder)
-            except Exception:
-                logging.exception(f'Failed to start engine {fn}!')
-                continue
+        # Engines are probed concurrently, each probe mostly waits for the
+        # engine process to start and reply to uci.
+        data = []
+        if engine_files:
+            max_workers = min(8, len(engine_files))
+            with ThreadPoolExecutor(max_workers=max_workers) as ex:
+                results = list(ex.map(self._probe_engine, engine_files))
 
-            engine_id_name = engine.id['name']
-            opt_dict = engine.options.items()
-            engine.quit()
-
-            for opt in opt_dict:
-                o = opt[1]
-
-                if o.type == 'spin':
-                    # Adjust hash and threads values
-                    if o.name.lower() == 'threads':
-                        value = 1
-                    elif o.name.lower() == 'hash':
-                        value = 32
-                    else:
-                        value = o.default
-
-                    option.append({'name': o.name,
-                                   'default': o.default,
-                                   'value': value,
-                                   'type': o.type,
-                                   'min': o.min,
-                                   'max': o.max})
-                elif o.type == 'combo':
-                    option.append({'name': o.name,
-                                   'default': o.default,
-                                   'value': o.default,
-                                   'type': o.type,
-                                   'choices':o.var})
-                else:
-                    option.append({'name': o.name,
-                                   'default': o.default,
-                                   'value': o.default,
-                                   'type': o.type})
-
-            # Save engine filename, working dir, name and options
-            wdir = Path(cwd, 'Engines').as_posix()
-            name = engine_id_name
-            protocol = 'uci'
-            self.engine_id_name_list.append(name)
-            data.append({'command': fn, 'workingDirectory': wdir,
-                         'name': name, 'protocol': protocol,
-                         'options': option})
+            data = [entry for entry in results if entry is not None]
 
         # Save data to pecg_engines.json
-        with open(self.engine_config_file, 'w') as h:
-            json.dump(data, h, indent=4)
+        self._save_engine_cfg(data)
 
     def get_time_mm_ss_ms(self, time_ms):
         """ Returns time in min:sec:millisec given time in millisec """
-        s, ms = divmod(int(time_ms), 1000)
-        m, s = divmod(s, 60)
-
-        # return '{:02d}m:{:02d}s:{:03d}ms'.format(m, s, ms)
-        return '{:02d}m:{:02d}s'.format(m, s)
+        return format_mm_ss(int(time_ms) // 1000)
 
     def get_time_h_mm_ss(self, time_ms, symbol=True):
         """
@@ -745,31 +886,22 @@ class RenChessApp:
         :param symbol:
         :return:
         """
-        s, ms = divmod(int(time_ms), 1000)
-        m, s = divmod(s, 60)
-        h, m = divmod(m, 60)
-
-        if not symbol:
-            return '{:01d}:{:02d}:{:02d}'.format(h, m, s)
-        return '{:01d}h:{:02d}m:{:02d}s'.format(h, m, s)
+        return format_h_mm_ss(int(time_ms) // 1000, symbol)
 
     def update_text_box(self, window, msg, is_hide):
         """ Update text elements """
         best_move = None
-        msg_str = str(msg)
-
-        if not 'bestmove ' in msg_str:
-            if 'info_all' in msg_str:
-                info_all = ' '.join(msg_str.split()[0:-1]).strip()
-                msg_line = '{}\n'.format(info_all)
-                window.FindElement('search_info_all_k').Update(
-                        '' if is_hide else msg_line)
-        else:
+        kind, payload = msg
+
+        if kind == 'info_all':
+            msg_line = '{}\n'.format(payload)
+            self.interface.elements['search_info_all_k'].Update(
+                    '' if is_hide else msg_line)
+        elif kind == 'bestmove':
             # Best move can be None because engine dies
-            try:
-                best_move = chess.Move.from_uci(msg.split()[1])
-            except Exception:
-                logging.exception('Engine sent {}.'.format(best_move))
+            best_move = payload
+            if best_move is None:
+                logging.warning('Engine sent %s bestmove.', best_move)
                 sg.Popup('Engine error, it sent a {} bestmove.\n'.format(
                     best_move) + 'Back to Neutral mode, it is better to '
                                  'change engine {}.'.format(
@@ -779,8 +911,14 @@ class RenChessApp:
         return best_move
 
     def get_tag_date(self):
-        """ Return date in pgn tag date format """
-        return datetime.today().strftime('%Y.%m.%d')
+        """ Return date in pgn tag date format, formatted once per day """
+        lt = time.localtime()
+        day = (lt.tm_year, lt.tm_yday)
+        if day != self._tag_date_day:
+            self._tag_date_day = day
+            self._tag_date = time.strftime('%Y.%m.%d', lt)
+
+        return self._tag_date
 
     def init_game(self):
         """ Initialize game with initial pgn tag values """
@@ -807,17 +945,10 @@ class RenChessApp:
 
     def clear_elements(self, window):
         """ Clear movelist, score, pv, time, depth and nps boxes """
-        window.FindElement('search_info_all_k').Update('')
-        window.FindElement('_movelist_').Update(disabled=False)
-        window.FindElement('_movelist_').Update('', disabled=True)
-        window.FindElement('polyglot_book1_k').Update('')
-        window.FindElement('polyglot_book2_k').Update('')
-        window.FindElement('advise_info_k').Update('')
-        window.FindElement('comment_k').Update('')
-        window.Element('w_base_time_k').Update('')
-        window.Element('b_base_time_k').Update('')
-        window.Element('w_elapse_k').Update('')
-        window.Element('b_elapse_k').Update('')    
+        el = self.interface.elements
+        el['_movelist_'].Update('', disabled=True)
+        for k in CLEAR_KEYS:
+            el[k].Update('')
            
     def define_timer(self, window, name='human'):
         """
@@ -833,27 +964,29 @@ class RenChessApp:
         elapse_str = self.get_time_h_mm_ss(timer.base)
         is_white_base = self.is_user_white and name == 'human' or \
                 not self.is_user_white and name != 'human'
-        window.Element('w_base_time_k' if is_white_base else 'b_base_time_k').Update(
+        self.interface.elements[
+                'w_base_time_k' if is_white_base else 'b_base_time_k'].Update(
                 elapse_str)
             
         return timer    
 
     def play_game(self):
         # Change menu from Neutral to Play
-        self.psg_board = copy.deepcopy(initial_board)
+        self.psg_board = copy_board(initial_board)
         window = self.interface.window
+        status_elem = self.interface.elements['_gamestatus_']
+        movelist_elem = self.interface.elements['_movelist_']
         while True:
             button, value = window.Read(timeout=100)
 
-            window.FindElement('_gamestatus_').Update('Mode     Play')
-            window.FindElement('_movelist_').Update(disabled=False)
-            window.FindElement('_movelist_').Update('', disabled=True)
+            status_elem.Update('Mode     Play')
+            movelist_elem.Update('', disabled=True)
 
             if chessGame.Game(self, self.interface, {}).run() == False:
                 return False
-            window.FindElement('_gamestatus_').Update('Mode     Neutral')
+            status_elem.Update('Mode     Neutral')
 
-            self.psg_board = copy.deepcopy(initial_board)
+            self.psg_board = copy_board(initial_board)
             self.interface.redraw_board()
             self.set_new_game()
     
@@ -868,16 +1001,17 @@ class RenChessApp:
 
         :return: list of engine filenames
         """
-        engine_list = []
         engine_path = Path('Engines')
-        files = os.listdir(engine_path)
-        for file in files:
-            if not file.endswith('.gz') and not file.endswith('.dll') \
-                    and not file.endswith('.bin') \
-                    and not file.endswith('.dat'):
-                engine_list.append(file)
-
-        return engine_list
+        mtime = os.stat(engine_path).st_mtime_ns
+        if self._engine_files is None or mtime != self._engine_files_mtime:
+            with os.scandir(engine_path) as it:
+                self._engine_files = [
+                        e.name for e in it if e.is_file() and
+                        os.path.splitext(e.name)[1].lower()
+                        not in ENGINE_EXCLUDE_EXT]
+            self._engine_files_mtime = mtime
+
+        return list(self._engine_files)
     
     def set_default_adviser_engine(self):    
         try:
@@ -904,60 +1038,113 @@ class RenChessApp:
             
         return engine_id_name
 
+    def startup_probe(self):
+        """
+        Run at startup in a thread. If engine config file (pecg_engines.json)
+        is missing, then create it. The engine id names are sent thru queue.
+
+        :return:
+        """
+        eng_id_name_list = []
+        try:
+            self.check_engine_config_file()
+            eng_id_name_list = self.get_engine_id_name_list()
+        except Exception:
+            logging.exception('Failed to read engine config file.')
+
+        self.queue.put(('startup_done', eng_id_name_list))
+
+    def set_default_engines(self, window, eng_id_name_list):
+        """
+        Define default opponent and adviser engines, user can change this
+        later.
+
+        :param window:
+        :param eng_id_name_list: engine id names from startup_probe()
+        :return:
+        """
+        self.engine_id_name_list = eng_id_name_list
+        self.get_default_engine_opponent()
+        self.set_default_adviser_engine()
+        self.interface.update_labels_and_game_tags(window, human=self.username)
+
+    def _on_main_puzzles(self):
+        """ Play puzzles from main page, returns False if app is exited """
+        puzzle_count = self.interface.show_puzzle_number_dialog()
+        if puzzle_count > 0:
+            self.interface.show_puzzle_page()
+            if self.puzzle_manager.play_puzzle(puzzle_count) == False:
+                return False
+        self.interface.show_main_page()
+        return True
+
+    def _on_main_review(self):
+        """ Review puzzles from main page, returns False if app is exited """
+        review_items = self.user.get_review_items()
+        if len(review_items) > 0:
+            self.interface.show_puzzle_page()
+            if self.puzzle_manager.review_puzzles(review_items) == False:
+                return False
+        self.interface.show_main_page()
+        return True
+
+    def _on_main_game(self):
+        """ Play a game from main page, returns False if app is exited """
+        self.interface.elements['main_page'].Update(visible=False)
+        self.interface.elements['game_column'].Update(visible=True)
+        return self.play_game() != False
+
     def main_loop(self):
         """
         Build GUI, read user and engine config files and take user inputs.
 
         :return:
         """
-        engine_id_name = None
         window = self.interface.create_default_window()
 
         # Read user config file, if missing create and new one
         self.check_user_config_file()
 
-        # If engine config file (pecg_engines.json) is missing, then create it        
-        self.check_engine_config_file()
-        self.engine_id_name_list = self.get_engine_id_name_list()
-
-        # Define default opponent engine, user can change this later.
-        engine_id_name = self.get_default_engine_opponent()
-
-        # Define default adviser engine, user can change this later.
-        self.set_default_adviser_engine()
+        # Engine config file is read in a thread, engines may be started if
+        # it is missing. Default engines are set when it is done.
+        is_startup_done = False
+        threading.Thread(target=self.startup_probe, daemon=True).start()
 
         self.init_game()
 
         # Initialize White and black boxes
-        while True:
-            button, value = window.Read(timeout=50)
-            self.interface.update_labels_and_game_tags(window, human=self.username)
-            break
+        button, value = window.Read(timeout=50)
+        self.interface.update_labels_and_game_tags(window, human=self.username)
+
+        # Main page buttons, a handler returns False if the app is exited
+        menu_handlers = {'main_puzzles': self._on_main_puzzles,
+                         'main_review': self._on_main_review,
+                         'main_game': self._on_main_game}
 
         # Mode: Neutral, main loop starts here
         while True:
-            button, value = window.Read(timeout=50)
-
-            if button == 'main_puzzles':
-                puzzle_count = self.interface.show_puzzle_number_dialog()
-                if puzzle_count > 0:
-                    self.interface.show_puzzle_page()
-                    if self.puzzle_manager.play_puzzle(puzzle_count) == False:
-                        break
-                self.interface.show_main_page()
-                continue
-            if button == 'main_review':
-                review_items = self.user.get_review_items()
-                if len(review_items) > 0:
-                    self.interface.show_puzzle_page()
-                    if self.puzzle_manager.review_puzzles(review_items) == False:
-                        break
-                self.interface.show_main_page()
-                continue
-            if button == 'main_game':
-                window.FindElement('main_page').Update(visible=False)
-                window.FindElement('game_column').Update(visible=True)
-                if self.play_game() == False:
+            # Poll for the startup probe result, after that Neutral mode has
+            # no periodic work and just waits for events.
+            button, value = window.Read(
+                    timeout=None if is_startup_done else 50)
+
+            # Most ticks have nothing in queue, skip get_nowait() and its
+            # queue.Empty exception.
+            if not is_startup_done and not self.queue.empty():
+                msg = self.queue.get_nowait()
+                if msg[0] == 'startup_done':
+                    self.set_default_engines(window, msg[1])
+                    is_startup_done = True
+
+            handler = menu_handlers.get(button)
+            if handler is not None:
+                # Games and puzzles need the default engines and labels,
+                # wait for the startup probe if it is still running.
+                if not is_startup_done:
+                    msg = self.queue.get()
+                    self.set_default_engines(window, msg[1])
+                    is_startup_done = True
+                if handler() == False:
                     # Exit app
                     break
                 continue
@@ -1,11 +1,29 @@
 import io
-import copy
 import time
 import chess
 import chess.pgn
 
 from globals import *
 
+# psg row and col of python-chess square s, see get_row()
+SQ_ROW = tuple(7 - chess.square_rank(s) for s in chess.SQUARES)
+SQ_COL = tuple(chess.square_file(s) for s in chess.SQUARES)
+
+# Index of python-chess square s in the flat psg board
+SQ_INDEX = tuple(SQ_ROW[s] * 8 + SQ_COL[s] for s in chess.SQUARES)
+
+# python-chess square at psg row r and col c, indexed by [r][c]
+RC_SQ = tuple(tuple(chess.square(c, 7 - r) for c in range(8)) for r in range(8))
+
+# Row of square s relative to side to move, indexed by [stm][s]
+SQ_REL_ROW = (SQ_ROW, tuple(chess.square_rank(s) for s in chess.SQUARES))
+
+# Rook from square, to square and piece of castle move in uci format
+CASTLE_ROOK = {'e1g1': (chess.H1, chess.F1, ROOKW),
+               'e1c1': (chess.A1, chess.D1, ROOKW),
+               'e8g8': (chess.H8, chess.F8, ROOKB),
+               'e8c8': (chess.A8, chess.D8, ROOKB)}
+
 class Game:
     def __init__(self, app, ui, game_info, fen='', is_white_to_move=True):
         self.game = chess.pgn.Game()
@@ -51,11 +69,11 @@ class Game:
         :param s: square
         :return: row
         """
-        return 7 - chess.square_rank(s)
+        return SQ_ROW[s]
 
     def get_col(self, s):
         """ Returns col given square s """
-        return chess.square_file(s)
+        return SQ_COL[s]
 
     def relative_row(self, s, stm):
         """
@@ -66,7 +84,7 @@ class Game:
         :param stm: side to move
         :return: relative row
         """
-        return 7 - self.get_row(s) if stm else self.get_row(s)
+        return SQ_REL_ROW[stm][s]
 
     def update_ep(self, move, stm):
         """
@@ -83,37 +101,22 @@ class Game:
         else:
             capture_sq = to + 8
 
-        self.app.psg_board[self.get_row(capture_sq)][self.get_col(capture_sq)] = BLANK
-        self.ui.redraw_board()
+        self.app.psg_board[SQ_INDEX[capture_sq]] = BLANK
+        self.ui.redraw_squares([(SQ_ROW[capture_sq], SQ_COL[capture_sq])])
 
     def update_rook(self, move):
         """
         Update rook location for castle move.
 
-        :param window:
         :param move: uci move format
         :return:
         """
-        if move == 'e1g1':
-            fr = chess.H1
-            to = chess.F1
-            pc = ROOKW
-        elif move == 'e1c1':
-            fr = chess.A1
-            to = chess.D1
-            pc = ROOKW
-        elif move == 'e8g8':
-            fr = chess.H8
-            to = chess.F8
-            pc = ROOKB
-        elif move == 'e8c8':
-            fr = chess.A8
-            to = chess.D8
-            pc = ROOKB
-
-        self.app.psg_board[self.get_row(fr)][self.get_col(fr)] = BLANK
-        self.app.psg_board[self.get_row(to)][self.get_col(to)] = pc
-        self.ui.redraw_board()
+        fr, to, pc = CASTLE_ROOK[move]
+
+        self.app.psg_board[SQ_INDEX[fr]] = BLANK
+        self.app.psg_board[SQ_INDEX[to]] = pc
+        self.ui.redraw_squares([(SQ_ROW[fr], SQ_COL[fr]),
+                                (SQ_ROW[to], SQ_COL[to])])
 
     def get_promo_piece(self, move, stm, human):
         """
@@ -142,88 +145,34 @@ class Game:
         return pyc_promo
 
     def pyc_to_psg(self, pyc, stm):
-        if stm:
-            if pyc == chess.QUEEN:
-                psg = QUEENW
-            elif pyc == chess.ROOK:
-                psg = ROOKW
-            elif pyc == chess.BISHOP:
-                psg = BISHOPW
-            elif pyc == chess.KNIGHT:
-                psg = KNIGHTW
-        else:
-            if pyc == chess.QUEEN:
-                psg = QUEENB
-            elif pyc == chess.ROOK:
-                psg = ROOKB
-            elif pyc == chess.BISHOP:
-                psg = BISHOPB
-            elif pyc == chess.KNIGHT:
-                psg = KNIGHTB
-        return psg
+        """ Returns psg promote piece given pyc piece type and side to move """
+        return promote_pyc_to_psg[(stm, pyc)]
 
     def fen_to_psg_board(self, fen):
         """ Update psg_board based on FEN """
-        psgboard = []
+        psgboard = bytearray()
 
-        # Get piece locations only to build psg board
+        # Get piece locations only to build psg board. FEN starts from rank 8
+        # as the psg board row 0.
         pc_locations = fen.split()[0]
 
-        board = chess.BaseBoard(pc_locations)
-        old_r = None
-
-        for s in chess.SQUARES:
-            r = chess.square_rank(s)
-
-            if old_r is None:
-                piece_r = []
-            elif old_r != r:
-                psgboard.append(piece_r)
-                piece_r = []
-            elif s == 63:
-                psgboard.append(piece_r)
-
-            try:
-                pc = board.piece_at(s^56)
-            except Exception:
-                pc = None
-                logging.exception('Failed to get piece.')
-
-            if pc is not None:
-                pt = pc.piece_type
-                c = pc.color
-                if c:
-                    if pt == chess.PAWN:
-                        piece_r.append(PAWNW)
-                    elif pt == chess.KNIGHT:
-                        piece_r.append(KNIGHTW)
-                    elif pt == chess.BISHOP:
-                        piece_r.append(BISHOPW)
-                    elif pt == chess.ROOK:
-                        piece_r.append(ROOKW)
-                    elif pt == chess.QUEEN:
-                        piece_r.append(QUEENW)
-                    elif pt == chess.KING:
-                        piece_r.append(KINGW)
+        for fen_rank in pc_locations.split('/'):
+            piece_r = []
+            for c in fen_rank:
+                if c.isdigit():
+                    piece_r.extend([BLANK] * int(c))
+                elif c in fen_piece_to_psg:
+                    piece_r.append(fen_piece_to_psg[c])
                 else:
-                    if pt == chess.PAWN:
-                        piece_r.append(PAWNB)
-                    elif pt == chess.KNIGHT:
-                        piece_r.append(KNIGHTB)
-                    elif pt == chess.BISHOP:
-                        piece_r.append(BISHOPB)
-                    elif pt == chess.ROOK:
-                        piece_r.append(ROOKB)
-                    elif pt == chess.QUEEN:
-                        piece_r.append(QUEENB)
-                    elif pt == chess.KING:
-                        piece_r.append(KINGB)
-
-            # Else if pc is None or square is empty
-            else:
-                piece_r.append(BLANK)
+                    raise ValueError('invalid piece {} in fen {}'.format(
+                        c, fen))
+            if len(piece_r) != 8:
+                raise ValueError('invalid rank {} in fen {}'.format(
+                    fen_rank, fen))
+            psgboard.extend(piece_r)
 
-            old_r = r
+        if len(psgboard) != 64:
+            raise ValueError('expected 8 ranks in fen {}'.format(fen))
 
         self.app.psg_board = psgboard
         self.ui.redraw_board()
@@ -232,7 +181,8 @@ class Game:
         move_state = 0
         window = self.ui.window
         while True:
-            button, value = window.Read(timeout=100)
+            # Nothing to refresh while waiting for the user, block on events
+            button, value = window.Read()
 
             if button is None:
                 logging.info('Quit app X is pressed.')
@@ -249,19 +199,19 @@ class Game:
                     self.ui.change_square_color(fr_row, fr_col)
 
                     move_state = 1
-                    moved_piece = self.board.piece_type_at(chess.square(fr_col, 7-fr_row))  # Pawn=1
+                    moved_piece = self.board.piece_type_at(RC_SQ[fr_row][fr_col])  # Pawn=1
                     
                 # Else if to_sq button is pressed
                 elif move_state == 1:
                     is_promote = False
                     move_to = button
                     to_row, to_col = move_to
-                    button_square = window.FindElement(key=(fr_row, fr_col))
+                    button_square = self.ui.sq_elems[fr_row][fr_col]
                     
                     # If move is cancelled, pressing same button twice
                     if move_to == move_from:
                         # Restore the color of the pressed board square
-                        color = self.ui.sq_dark_color if (to_row + to_col) % 2 else self.ui.sq_light_color
+                        color = self.ui.sq_color[to_row][to_col]
 
                         # Restore the color of the fr square
                         button_square.Update(button_color=('white', color))
@@ -273,10 +223,10 @@ class Game:
 
                     # Get the fr_sq and to_sq of the move from user, based from this info
                     # we will create a move based from python-chess format.
-                    # Note chess.square() and chess.Move() are from python-chess module
+                    # Note chess.Move() is from python-chess module
                     fr_row, fr_col = move_from
-                    fr_sq = chess.square(fr_col, 7-fr_row)
-                    to_sq = chess.square(to_col, 7-to_row)
+                    fr_sq = RC_SQ[fr_row][fr_col]
+                    to_sq = RC_SQ[to_row][to_col]
 
                     # If user move is a promote
                     if self.relative_row(to_sq, self.board.turn) == RANK_8 and \
@@ -295,8 +245,7 @@ class Game:
                     # Else if move is illegal
                     else:
                         move_state = 0
-                        color = self.ui.sq_dark_color \
-                            if (move_from[0] + move_from[1]) % 2 else self.ui.sq_light_color
+                        color = self.ui.sq_color[move_from[0]][move_from[1]]
 
                         # Restore the color of the fr square
                         button_square.Update(button_color=('white', color))
@@ -304,36 +253,36 @@ class Game:
 
     def update_board(self, move, clear_move=False):
         fr_sq, to_sq = move.from_square, move.to_square
-        fr_col, fr_row = chess.square_file(fr_sq), 7 - chess.square_rank(fr_sq)
-        to_col, to_row = chess.square_file(to_sq), 7 - chess.square_rank(to_sq)
+        fr_col, fr_row = SQ_COL[fr_sq], SQ_ROW[fr_sq]
+        to_col, to_row = SQ_COL[to_sq], SQ_ROW[to_sq]
         if  clear_move:
-            color = self.ui.sq_dark_color if (fr_row + fr_col) % 2 else self.ui.sq_light_color
-            button_square = self.ui.window.FindElement(key=(fr_row, fr_col))
+            color = self.ui.sq_color[fr_row][fr_col]
+            button_square = self.ui.sq_elems[fr_row][fr_col]
             button_square.Update(button_color=('white', color))
             return
 
-        piece = self.app.psg_board[fr_row][fr_col]  # get the move-from piece
+        piece = self.app.psg_board[SQ_INDEX[fr_sq]]  # get the move-from piece
 
         # Update rook location if this is a castle move
         if self.board.is_castling(move):
-            self.update_rook(self.ui.window, str(move))
+            self.update_rook(move.uci())
 
         # Update board if e.p capture
         elif self.board.is_en_passant(move):
             self.update_ep(move, self.board.turn)
 
         # Empty the board from_square, applied to any types of move
-        self.app.psg_board[fr_row][fr_col] = BLANK
+        self.app.psg_board[SQ_INDEX[fr_sq]] = BLANK
 
         # Update board to_square if move is a promotion
         if move.promotion:
-            self.app.psg_board[to_row][to_col] = self.pyc_to_psg(move.promotion, self.board.turn)
+            self.app.psg_board[SQ_INDEX[to_sq]] = self.pyc_to_psg(move.promotion, self.board.turn)
         # Update the to_square if not a promote move
         else:
             # Place piece in the move to_square
-            self.app.psg_board[to_row][to_col] = piece
+            self.app.psg_board[SQ_INDEX[to_sq]] = piece
 
-        self.ui.redraw_board()
+        self.ui.redraw_squares([(fr_row, fr_col), (to_row, to_col)])
 
         self.board.push(move)
         
@@ -342,6 +291,13 @@ class Game:
         self.ui.change_square_color(to_row, to_col)
 
     def wait(self, seconds):
-        cur_time = time.time()
-        while time.time() < cur_time + seconds:
-            button, value = self.ui.window.Read(timeout=100)
\ No newline at end of file
+        """ Keep the window responsive for seconds, timed by the monotonic clock """
+        end_time = time.monotonic() + seconds
+        while True:
+            remaining_ms = int((end_time - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                break
+            button, value = self.ui.window.Read(timeout=remaining_ms)
+            if button is None:
+                self.is_exit_app = True
+                break
\ No newline at end of file
@@ -4,26 +4,8 @@ import os
 import chess.pgn
 from chessGame import Game
 
-class PuzzleManager:
-    def __init__(self, app):
-        self.app = app
-        self.puzzles = []        
-
-    def load_puzzles(self, filename):
-        with open(filename, 'r') as f:
-            context = f.readlines()
-            i = 0
-            while i < len(context):
-                line = context[i]
-                if len(line.strip()) == 0:
-                    i += 1
-                else:
-                    self.puzzles.append([context[i].strip(), context[i+1].strip(), context[i+2].strip()])
-                    i += 3
-
-    def prepare_play_puzzle(self, event, fen, moves, progress_str):
-        pgn = """
-[Event "%s"]
+# Pgn of a puzzle, filled with event, fen and moves
+PUZZLE_PGN = """[Event "%s"]
 [Site ""]
 [Date ""]
 [Round ""]
@@ -34,17 +16,37 @@ class PuzzleManager:
 [FEN "%s"]
 
 %s
-        """ % (event, fen, moves)
+"""
+
+class PuzzleManager:
+    puzzle_file = os.path.join('data', 'polgar_5334.dat')
+
+    def __init__(self, app):
+        self.app = app
+        self.puzzles = []        
+
+    def load_puzzles(self, filename):
+        # A puzzle is 3 lines, event, fen and moves, puzzles are separated
+        # by empty lines.
+        with open(filename, 'r') as f:
+            lines = [line.strip() for line in f if line.strip()]
+        self.puzzles.extend(lines[i:i + 3] for i in range(0, len(lines) - 2, 3))
+
+    def ensure_puzzles(self):
+        """ Load the puzzle file once, it is kept for the next plays """
+        if len(self.puzzles) == 0:
+            self.load_puzzles(self.puzzle_file)
+
+    def prepare_play_puzzle(self, event, fen, moves, progress_str):
+        pgn = PUZZLE_PGN % (event, fen, moves)
         items = event.split(" ")
-        self.app.interface.window['puzzle_title'].Update("Puzzle %s %s" \
-            % (items[0], progress_str))
-        self.app.interface.window['puzzle_instruction'].Update(" ".join(items[1:]))
+        el = self.app.interface.elements
+        el['puzzle_title'].Update("Puzzle %s %s" % (items[0], progress_str))
+        el['puzzle_instruction'].Update(" ".join(items[1:]))
         return Puzzle(self.app, self.app.interface, {}, pgn)
 
     def play_puzzle(self, puzzle_count):
-        if len(self.puzzles) == 0:
-            puzzle_file = os.path.join(os.getcwd(), "data\\polgar_5334.dat")
-            self.load_puzzles(puzzle_file)
+        self.ensure_puzzles()
 
         puzzle_finished = int(self.app.user.config['Polgar5334']['Puzzle_Finished'])
         id = puzzle_finished
@@ -64,9 +66,7 @@ class PuzzleManager:
 
     def review_puzzles(self, review_items):
         print(review_items)
-        if len(self.puzzles) == 0:
-            puzzle_file = os.path.join(os.getcwd(), "data\\polgar_5334.dat")
-            self.load_puzzles(puzzle_file)
+        self.ensure_puzzles()
 
         puzzle_count = len(review_items)
         for i, item in enumerate(review_items):
@@ -94,9 +94,9 @@ class Puzzle(Game):
         self.move_id = -1
         self.performance = [0, 0]   # [good_move, wrong_move]
         self.rank = ""        
-        self.ui.window['puzzle_comment'].Update("")
-        self.ui.window['puzzle_moves'].update(values=self.moves)
-        self.ui.window['puzzle_next'].update(disabled=True)
+        self.ui.elements['puzzle_comment'].Update("")
+        self.ui.elements['puzzle_moves'].update(values=self.moves)
+        self.ui.elements['puzzle_next'].update(disabled=True)
         self.fen_to_psg_board(self.game.headers["FEN"])     
 
     def run(self):
@@ -107,35 +107,37 @@ class Puzzle(Game):
             if self.play_side != self.player:
                 self.wait(1)
                 self.moves[self.move_id][2] = pgn_move_san
-                self.ui.window['puzzle_moves'].update(values=self.moves)
+                self.ui.elements['puzzle_moves'].update(values=self.moves)
                 self.update_board(pgn_move)
             else:
                 while True:
                     move = self.get_user_input()
                     if self.is_exit_app:
                         break
-                    san = self.board.san(move)
-                    if san != pgn_move_san:
+                    # Only a wrong move needs its own san for the comment
+                    is_good_move = move == pgn_move
+                    san = pgn_move_san if is_good_move else self.board.san(move)
+                    if not is_good_move:
                         self.performance[1] += 1
-                        self.ui.window['puzzle_comment'].Update("%s  Wrong move!" % san, text_color='red')
+                        self.ui.elements['puzzle_comment'].Update("%s  Wrong move!" % san, text_color='red')
                         self.update_board(move, clear_move=True)
                     else:
                         self.performance[0] += 1
-                        self.ui.window['puzzle_comment'].Update("%s  Good move!" % san, text_color='green')
+                        self.ui.elements['puzzle_comment'].Update("%s  Good move!" % san, text_color='green')
                         self.move_id += 1
                         self.moves.append([str(self.move_id + 1), "", ""])                        
                         self.moves[self.move_id][1] = san
-                        self.ui.window['puzzle_moves'].update(values=self.moves)                        
+                        self.ui.elements['puzzle_moves'].update(values=self.moves)                        
                         self.update_board(move)
                         break
             self.play_side = 'White' if self.play_side == 'Black' else 'Black'
         if not self.is_exit_app:
             ranks = ["S", "A", "B", "C"]
             self.rank = ranks[3 if self.performance[1] > 3 else self.performance[1]]
-            self.ui.window["puzzle_comment"].Update("%s-Rank Cleared" % self.rank, text_color='green')
-            self.ui.window['puzzle_next'].update(disabled=False)
+            self.ui.elements['puzzle_comment'].Update("%s-Rank Cleared" % self.rank, text_color='green')
+            self.ui.elements['puzzle_next'].update(disabled=False)
             while True:
-                button, value = self.ui.window.Read(timeout=100)
+                button, value = self.ui.window.Read()
 
                 if button is None:
                     self.is_exit_app = True
@@ -6,7 +6,7 @@ import time
 from sys import platform
 from pathlib import Path
 
-from globals import MAX_DEPTH
+from globals import MAX_DEPTH, load_json_file
 
 class RunEngine(threading.Thread):
     pv_length = 9
@@ -75,41 +75,41 @@ class RunEngine(threading.Thread):
         However if default_value and user_value are the same, we will not send
         commands to set the option value because the value is default already.
         """
-        with open(self.engine_config_file, 'r') as json_file:
-            data = json.load(json_file)
-            for p in data:
-                if p['name'] == self.engine_id_name:
-                    for n in p['options']:
-
-                        if n['name'].lower() == 'ownbook':
-                            self.is_ownbook = True
-
-                        # Ignore button type for a moment.
-                        if n['type'] == 'button':
-                            continue
-
-                        if n['type'] == 'spin':
-                            user_value = int(n['value'])
-                            default_value = int(n['default'])
-                        else:
-                            user_value = n['value']
-                            default_value = n['default']
-
-                        if user_value != default_value:
-                            try:
-                                self.engine.configure({n['name']: user_value})
-                                logging.info('Set {} to {}'.format(
-                                    n['name'], user_value))
-                            except Exception:
-                                logging.exception('{Failed to configure '
-                                                  'engine}')
+        data = load_json_file(self.engine_config_file)
+        for p in data:
+            if p['name'] == self.engine_id_name:
+                for n in p['options']:
+
+                    if n['name'].lower() == 'ownbook':
+                        self.is_ownbook = True
+
+                    # Ignore button type for a moment.
+                    if n['type'] == 'button':
+                        continue
+
+                    if n['type'] == 'spin':
+                        user_value = int(n['value'])
+                        default_value = int(n['default'])
+                    else:
+                        user_value = n['value']
+                        default_value = n['default']
+
+                    if user_value != default_value:
+                        try:
+                            self.engine.configure({n['name']: user_value})
+                            logging.info('Set %s to %s', n['name'],
+                                         user_value)
+                        except Exception:
+                            logging.exception('{Failed to configure '
+                                              'engine}')
 
     def run(self):
         """
         Run engine to get search info and bestmove. If there is error we
         still send bestmove None.
 
-        :return: bestmove thru que
+        :return: (kind, payload) tuples thru que, kind is 'pv', 'info_all'
+            or 'bestmove'. The bestmove payload is a chess.Move or None.
         """
         folder = Path(self.engine_path_and_file)
         folder = folder.parents[0]
@@ -123,13 +123,13 @@ class RunEngine(threading.Thread):
                 self.engine = chess.engine.SimpleEngine.popen_uci(
                     self.engine_path_and_file, cwd=folder)
         except chess.engine.EngineTerminatedError:
-            logging.warning('Failed to start {}.'.format(self.engine_path_and_file))
-            self.eng_queue.put('bestmove {}'.format(self.bm))
+            logging.warning('Failed to start %s.', self.engine_path_and_file)
+            self.eng_queue.put(('bestmove', self.bm))
             return
         except Exception:
-            logging.exception('Failed to start {}.'.format(
-                self.engine_path_and_file))
-            self.eng_queue.put('bestmove {}'.format(self.bm))
+            logging.exception('Failed to start %s.',
+                              self.engine_path_and_file)
+            self.eng_queue.put(('bestmove', self.bm))
             return
 
         # Set engine option values
@@ -188,15 +188,15 @@ class RunEngine(threading.Thread):
                             else:
                                 self.pv = self.board.variation_san(self.pv)
 
-                            self.eng_queue.put('{} pv'.format(self.pv))
+                            self.eng_queue.put(('pv', self.pv))
                             self.bm = info['pv'][0]
 
                         # score, depth, time, pv
                         if self.score is not None and \
                                 self.pv is not None and self.depth is not None:
-                            info_to_send = '{:+5.2f} | {} | {:0.1f}s | {} info_all'.format(
+                            info_to_send = '{:+5.2f} | {} | {:0.1f}s | {}'.format(
                                     self.score, self.depth, self.time, self.pv)
-                            self.eng_queue.put('{}'.format(info_to_send))
+                            self.eng_queue.put(('info_all', info_to_send))
 
                         # Send stop if movetime is exceeded
                         if not is_time_check and self.tc_type != 'fischer' \
@@ -217,7 +217,7 @@ class RunEngine(threading.Thread):
                         logging.exception('Failed to parse search info.')
         else:
             result = self.engine.play(self.board, limit,info=chess.engine.INFO_ALL)
-            logging.info('result: {}'.format(result))
+            logging.info('result: %s', result)
             try:
                 self.depth = result.info['depth']
             except KeyError:
@@ -249,9 +249,9 @@ class RunEngine(threading.Thread):
                 logging.exception('pv is missing.')
 
             if self.pv is not None:
-                info_to_send = '{:+5.2f} | {} | {:0.1f}s | {} info_all'.format(
+                info_to_send = '{:+5.2f} | {} | {:0.1f}s | {}'.format(
                     self.score, self.depth, self.time, self.pv)
-                self.eng_queue.put('{}'.format(info_to_send))
+                self.eng_queue.put(('info_all', info_to_send))
             self.bm = result.move
 
         # Apply engine move delay if movetime is small
@@ -259,7 +259,7 @@ class RunEngine(threading.Thread):
             while True:
                 if time.perf_counter() - start_time >= self.move_delay_sec:
                     break
-                logging.info('Delay sending of best move {}'.format(self.bm))
+                logging.info('Delay sending of best move %s', self.bm)
                 time.sleep(1.0)
 
         # If bm is None, we will use engine.play()
@@ -270,8 +270,8 @@ class RunEngine(threading.Thread):
                 self.bm = result.move
             except Exception:
                 logging.exception('Failed to get engine bestmove.')
-        self.eng_queue.put('bestmove {}' .format(self.bm))
-        logging.info('bestmove {}'.format(self.bm))
+        self.eng_queue.put(('bestmove', self.bm))
+        logging.info('bestmove %s', self.bm)
 
     def quit_engine(self):
         """ Quit engine """
@@ -1,8 +1,15 @@
 import os
 import sys
+import json
+import base64
 import chess
 import logging
 
+try:
+    import orjson  # Optional, faster json parser
+except ImportError:
+    orjson = None
+
 log_format = '%(asctime)s :: %(funcName)s :: line: %(lineno)d :: %(' \
                  'levelname)s :: %(message)s'
 logging.basicConfig(filename='pecg_log.txt', filemode='w', level=logging.DEBUG,
@@ -15,6 +22,16 @@ BOX_TITLE = '{} {}'.format(APP_NAME, APP_VERSION)
 
 
 platform = sys.platform
+
+
+def load_json_file(filename):
+    """ Returns parsed json file, orjson is used when it is installed """
+    if orjson is None:
+        with open(filename, 'r') as json_file:
+            return json.load(json_file)
+
+    with open(filename, 'rb') as json_file:
+        return orjson.loads(json_file.read())
     
 
 ico_path = {'win32': {'pecg': 'Icon/pecg.ico', 'enemy': 'Icon/enemy.ico',
@@ -63,14 +80,15 @@ RANK_2 = 1
 RANK_1 = 0
 
 
-initial_board = [[ROOKB, KNIGHTB, BISHOPB, QUEENB, KINGB, BISHOPB, KNIGHTB, ROOKB],
-                 [PAWNB, ] * 8,
-                 [BLANK, ] * 8,
-                 [BLANK, ] * 8,
-                 [BLANK, ] * 8,
-                 [BLANK, ] * 8,
-                 [PAWNW, ] * 8,
-                 [ROOKW, KNIGHTW, BISHOPW, QUEENW, KINGW, BISHOPW, KNIGHTW, ROOKW]]
+# psg board is flat, the piece at row i and col j is at index i * 8 + j
+initial_board = bytes([ROOKB, KNIGHTB, BISHOPB, QUEENB, KINGB, BISHOPB, KNIGHTB, ROOKB] +
+                      [PAWNB, ] * 8 +
+                      [BLANK, ] * 8 +
+                      [BLANK, ] * 8 +
+                      [BLANK, ] * 8 +
+                      [BLANK, ] * 8 +
+                      [PAWNW, ] * 8 +
+                      [ROOKW, KNIGHTW, BISHOPW, QUEENW, KINGW, BISHOPW, KNIGHTW, ROOKW])
 
 
 white_init_promote_board = [[QUEENW, ROOKW, BISHOPW, KNIGHTW]]
@@ -78,6 +96,11 @@ white_init_promote_board = [[QUEENW, ROOKW, BISHOPW, KNIGHTW]]
 black_init_promote_board = [[QUEENB, ROOKB, BISHOPB, KNIGHTB]]
 
 
+def copy_board(board):
+    """ Returns a mutable copy of a flat psg board """
+    return bytearray(board)
+
+
 HELP_MSG = """(A) To play a game
 You should be in Play mode.
 1. Mode->Play
@@ -130,6 +153,30 @@ images = {BISHOPB: bishopB, BISHOPW: bishopW, PAWNB: pawnB, PAWNW: pawnW,
           QUEENB: queenB, QUEENW: queenW, BLANK: blank}
 
 
+def load_image_data(filename):
+    """ Returns base64 encoded content of image file """
+    with open(filename, 'rb') as f:
+        return base64.b64encode(f.read())
+
+
+class ImageData(dict):
+    """ Base64 piece images keyed by piece, each file is read on first use """
+    def __missing__(self, piece):
+        data = self[piece] = load_image_data(images[piece])
+        return data
+
+
+# Piece images for button updates with image_data
+image_data = ImageData()
+
+
+# Piece symbol in FEN to psg (pysimplegui) piece
+fen_piece_to_psg = {'P': PAWNW, 'N': KNIGHTW, 'B': BISHOPW, 'R': ROOKW,
+                    'Q': QUEENW, 'K': KINGW,
+                    'p': PAWNB, 'n': KNIGHTB, 'b': BISHOPB, 'r': ROOKB,
+                    'q': QUEENB, 'k': KINGB}
+
+
 # Promote piece from psg (pysimplegui) to pyc (python-chess)
 promote_psg_to_pyc = {KNIGHTB: chess.KNIGHT, BISHOPB: chess.BISHOP,
                       ROOKB: chess.ROOK, QUEENB: chess.QUEEN,
@@ -137,6 +184,17 @@ promote_psg_to_pyc = {KNIGHTB: chess.KNIGHT, BISHOPB: chess.BISHOP,
                       ROOKW: chess.ROOK, QUEENW: chess.QUEEN,}
 
 
+# Promote piece from pyc (python-chess) to psg, key is (color, piece type)
+promote_pyc_to_psg = {(chess.WHITE, chess.QUEEN): QUEENW,
+                      (chess.WHITE, chess.ROOK): ROOKW,
+                      (chess.WHITE, chess.BISHOP): BISHOPW,
+                      (chess.WHITE, chess.KNIGHT): KNIGHTW,
+                      (chess.BLACK, chess.QUEEN): QUEENB,
+                      (chess.BLACK, chess.ROOK): ROOKB,
+                      (chess.BLACK, chess.BISHOP): BISHOPB,
+                      (chess.BLACK, chess.KNIGHT): KNIGHTB}
+
+
 INIT_PGN_TAG = {
         'Event': 'Human vs computer',
         'White': 'Human',
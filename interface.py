@@ -1,22 +1,43 @@
-import copy
 from sys import platform
 import PySimpleGUI as sg
 from globals import *
 
+# Elements that are updated during a game, their handles are cached
+CACHED_ELEMENT_KEYS = ('_gamestatus_', '_movelist_', 'comment_k',
+                       'search_info_all_k', 'advise_info_k',
+                       'polyglot_book1_k', 'polyglot_book2_k',
+                       'w_base_time_k', 'b_base_time_k',
+                       'w_elapse_k', 'b_elapse_k',
+                       'puzzle_comment', 'puzzle_moves', 'puzzle_next',
+                       'puzzle_title', 'puzzle_instruction',
+                       'main_page', 'play_page', 'game_column',
+                       'puzzle_column', '_White_', '_Black_')
+
 class RenChessInterface:
     def __init__(self, chess_app):
         self.chess_app = chess_app
         self.menu_elem = None
         self.gui_theme = 'Reddit'
         self.window = None
+        self.elements = {}
+        self.promo_windows = {True: None, False: None}  # key is side to move
+        self.sq_elems = []  # 8x8 board square buttons, [row][col]
+        self.drawn_board = [[None] * 8 for _ in range(8)]  # pieces on buttons
+        self.highlighted = set()  # (row, col) of squares not in sq_color
 
         # Default board color is brown
         self.sq_light_color = '#F0D9B5'
         self.sq_dark_color = '#B58863'
+        self.sq_color = [[self.sq_dark_color if (i + j) % 2 else
+                          self.sq_light_color for j in range(8)]
+                         for i in range(8)]
 
         # Move highlight, for brown board
         self.move_sq_light_color = '#E8E18E'
         self.move_sq_dark_color = '#B8AF4E'
+        self.move_sq_color = [[self.move_sq_dark_color if (i + j) % 2 else
+                               self.move_sq_light_color for j in range(8)]
+                              for i in range(8)]
 
     def display_play_menu(self):
         menu_def_play = [
@@ -34,13 +55,10 @@ class RenChessInterface:
         ]
         self.menu_elem.Update(menu_def_play)
     
-    def render_square(self, image, key, location):
-        """ Returns an RButton (Read Button) with image image """
-        if (location[0] + location[1]) % 2:
-            color = self.sq_dark_color  # Dark square
-        else:
-            color = self.sq_light_color
-        return sg.RButton('', image_filename=image, size=(1, 1),
+    def render_square(self, piece, key, location):
+        """ Returns an RButton (Read Button) with the image of piece """
+        color = self.sq_color[location[0]][location[1]]
+        return sg.RButton('', image_data=image_data[piece], size=(1, 1),
                           border_width=0, button_color=('white', color),
                           pad=(0, 0), key=key)
 
@@ -48,30 +66,32 @@ class RenChessInterface:
         """ 
         Change the color of a square based on square row and col.
         """
-        btn_sq = self.window.FindElement(key=(row, col))
-        is_dark_square = True if (row + col) % 2 else False
-        bd_sq_color = self.move_sq_dark_color if is_dark_square else \
-                      self.move_sq_light_color
-        btn_sq.Update(button_color=('white', bd_sq_color))
+        btn_sq = self.sq_elems[row][col]
+        self.highlighted.add((row, col))
+        btn_sq.Update(button_color=('white', self.move_sq_color[row][col]))
 
-    def select_promotion_piece(self, stm):
+    def get_promo_window(self, stm):
         """
-        Allow user to select a piece type to promote to.
+        Returns the promotion window of side to move. It is built once,
+        hidden, and reused for the next promotions.
 
         :param stm: side to move
-        :return: promoted piece, i.e QUEENW, QUEENB ...
+        :return: hidden promotion window
         """
-        piece = None
+        promo_window = self.promo_windows[stm]
+        if promo_window is not None:
+            return promo_window
+
         board_layout, row = [], []
 
-        psg_promote_board = copy.deepcopy(white_init_promote_board) if stm \
-                else copy.deepcopy(black_init_promote_board)
+        psg_promote_board = white_init_promote_board if stm \
+                else black_init_promote_board
 
         # Loop through board and create buttons with images        
         for i in range(1):
             for j in range(4):
-                piece_image = images[psg_promote_board[i][j]]
-                row.append(self.render_square(piece_image, key=(i, j),
+                row.append(self.render_square(psg_promote_board[i][j],
+                                              key=(i, j),
                                               location=(i, j)))
 
             board_layout.append(row)
@@ -80,20 +100,40 @@ class RenChessInterface:
                                  board_layout,
                                  default_button_element_size=(12, 1),
                                  auto_size_buttons=False,
-                                 icon=ico_path[platform]['pecg'])
+                                 icon=ico_path[platform]['pecg'],
+                                 finalize=True)
+        promo_window.Hide()
+        self.promo_windows[stm] = promo_window
 
-        while True:
-            button, value = promo_window.Read(timeout=0)
-            if button is None:
-                break
-            if type(button) is tuple:
-                move_from = button
-                fr_row, fr_col = move_from
-                piece = psg_promote_board[fr_row][fr_col]
-                logging.info('promote piece: {}'.format(piece))
-                break
+        return promo_window
 
-        promo_window.Close()
+    def select_promotion_piece(self, stm):
+        """
+        Allow user to select a piece type to promote to.
+
+        :param stm: side to move
+        :return: promoted piece, i.e QUEENW, QUEENB ...
+        """
+        piece = None
+        psg_promote_board = white_init_promote_board if stm \
+                else black_init_promote_board
+
+        promo_window = self.get_promo_window(stm)
+        promo_window.UnHide()
+
+        # Only the piece buttons send events, wait for one of them
+        button, value = promo_window.Read()
+        if button is None:
+            # Window is closed by user, build a new one next time
+            self.promo_windows[stm] = None
+            return piece
+
+        if type(button) is tuple:
+            fr_row, fr_col = button
+            piece = psg_promote_board[fr_row][fr_col]
+            logging.info('promote piece: %s', piece)
+
+        promo_window.Hide()
 
         return piece
 
@@ -106,7 +146,7 @@ class RenChessInterface:
         :return: board layout
         """
         file_char_name = 'abcdefgh'
-        self.chess_app.psg_board = copy.deepcopy(initial_board)
+        self.chess_app.psg_board = copy_board(initial_board)
 
         board_layout = []
 
@@ -126,8 +166,8 @@ class RenChessInterface:
             # Row numbers at left of board is blank
             row = [sg.Text(str(8 - i))]
             for j in range(start, end, step):
-                piece_image = images[self.chess_app.psg_board[i][j]]
-                row.append(self.render_square(piece_image, key=(i, j), location=(i, j)))
+                piece = self.chess_app.psg_board[i * 8 + j]
+                row.append(self.render_square(piece, key=(i, j), location=(i, j)))
             board_layout.append(row)
         row = [sg.Text(' ', size=(3, 1))]
         for c in file_char_name:
@@ -250,7 +290,7 @@ class RenChessInterface:
         self.window.Disable()
         w = sg.Window(win_title, layout, icon=ico_path[platform]['pecg'])
         while True:
-            e, v = w.Read(timeout=10)
+            e, v = w.Read()
             if e is None:
                 break
             if e == 'Cancel':
@@ -271,8 +311,18 @@ class RenChessInterface:
                            default_button_element_size=(12, 1),
                            auto_size_buttons=False,
                            icon=ico_path[platform]['pecg'])
+        self.cache_elements(self.window)
         return self.window
 
+    def cache_elements(self, window):
+        """ Keep handles of the elements that are updated during a game """
+        self.elements = {k: window[k] for k in CACHED_ELEMENT_KEYS}
+        self.sq_elems = [[window[(i, j)] for j in range(8)] for i in range(8)]
+
+        # Buttons of a new window are not drawn by redraw_board() yet
+        self.drawn_board = [[None] * 8 for _ in range(8)]
+        self.highlighted = set()
+
     def create_new_window(self, flip=False):
         """ Close the window param just before turning the new window """
 
@@ -288,55 +338,78 @@ class RenChessInterface:
             default_button_element_size=(12, 1),
             auto_size_buttons=False,
             location=(loc[0], loc[1]),
-            icon=ico_path[platform]['pecg'])
-
-        # Initialize White and black boxes
-        while True:
-            button, value = w.Read(timeout=50)
-            self.update_labels_and_game_tags(w, human=self.chess_app.username)
-            break
+            icon=ico_path[platform]['pecg'],
+            finalize=True)
 
         self.window.Close()
         self.window = w
+        self.cache_elements(w)
+
+        # Initialize White and black boxes
+        self.update_labels_and_game_tags(w, human=self.chess_app.username)
         return w
 
     def update_labels_and_game_tags(self, window, human='Human'):
         """ Update player names """
         engine_id = self.chess_app.opp_id_name
         game = self.chess_app.game
+        el = self.elements
         if self.chess_app.is_user_white:
-            window.FindElement('_White_').Update(human)
-            window.FindElement('_Black_').Update(engine_id)
+            el['_White_'].Update(human)
+            el['_Black_'].Update(engine_id)
             game.headers['White'] = human
             game.headers['Black'] = engine_id
         else:
-            window.FindElement('_White_').Update(engine_id)
-            window.FindElement('_Black_').Update(human)
+            el['_White_'].Update(engine_id)
+            el['_Black_'].Update(human)
             game.headers['White'] = engine_id
             game.headers['Black'] = human
 
-    def redraw_board(self):
+    def redraw_board(self, force=False):
         """
-        Redraw board at start and afte a move.
+        Redraw board at start and afte a move. Only the squares whose piece
+        has changed or that are highlighted are updated.
 
-        :param window:
+        :param force: update all squares
         :return:
         """
+        psg_board = self.chess_app.psg_board
         for i in range(8):
             for j in range(8):
-                color = self.sq_dark_color if (i + j) % 2 else \
-                        self.sq_light_color
-                piece_image = images[self.chess_app.psg_board[i][j]]
-                elem = self.window.FindElement(key=(i, j))
-                elem.Update(button_color=('white', color),
-                            image_filename=piece_image, )
+                piece = psg_board[i * 8 + j]
+                if not force and piece == self.drawn_board[i][j] and \
+                        (i, j) not in self.highlighted:
+                    continue
+                self.sq_elems[i][j].Update(
+                        button_color=('white', self.sq_color[i][j]),
+                        image_data=image_data[piece], )
+                self.drawn_board[i][j] = piece
+        self.highlighted.clear()
+
+    def redraw_squares(self, squares):
+        """
+        Redraw after a move when only a few squares are changed. The
+        highlighted squares are restored too.
+
+        :param squares: (row, col) of changed squares
+        :return:
+        """
+        psg_board = self.chess_app.psg_board
+        for i, j in self.highlighted.union(squares):
+            piece = psg_board[i * 8 + j]
+            self.sq_elems[i][j].Update(
+                    button_color=('white', self.sq_color[i][j]),
+                    image_data=image_data[piece], )
+            self.drawn_board[i][j] = piece
+        self.highlighted.clear()
 
     def show_puzzle_page(self):
-        self.window['main_page'].Update(visible=False)                
-        self.window['game_column'].Update(visible=False)
-        self.window['puzzle_column'].Update(visible=True)
-        self.window['play_page'].Update(visible=True)
+        el = self.elements
+        el['main_page'].Update(visible=False)
+        el['game_column'].Update(visible=False)
+        el['puzzle_column'].Update(visible=True)
+        el['play_page'].Update(visible=True)
 
     def show_main_page(self):                  
-        self.window['play_page'].Update(visible=False)
-        self.window['main_page'].Update(visible=True)      
\ No newline at end of file
+        self.elements['play_page'].Update(visible=False)
+        self.elements['main_page'].Update(visible=True)      
\ No newline at end of file
@@ -1,39 +1,45 @@
 import os
+import re
+
+# Puzzle files are scanned and written sequentially through a 1 MiB buffer
+FILE_BUFFER = 1 << 20
+
+# Pgn tags read by process_5334
+WHITE_TAG_RE = re.compile(rb'\[White "(.*)"\]')
+FEN_TAG_RE = re.compile(rb'\[FEN "(.*)"\]')
+
+# Bytes dropped by clean_5334: everything outside printable ASCII except newline
+NON_PRINTABLE = bytes(b for b in range(256) if (b < 32 or b >= 127) and b != 10)
 
 def process_wtharvey():
     files = ["wtharvey_mate2.txt", "wtharvey_mate3.txt", "wtharvey_mate4.txt"]
     target = "wtharvey.txt"
     folder = 'E:\Workshop\project\RenChess\data'
     id = 1
-    fw = open(os.path.join(folder, target), 'w')
-    puzzles = ""
+    puzzles = []
 
+    # Puzzle files are plain ASCII, so parse them as bytes
     for m, file in enumerate(files):
-        f = open(os.path.join(folder, file), 'r')
-        context = f.readlines()
-        i = 0
-        
-        while i < len(context):
-            line = context[i]
-            if len(line.strip()) == 0:
-                i += 1
-            else:
-                fen = context[i+1].strip()
-                start = fen.split(" ")[1]
-                if start == "w":
-                    s = "White"
-                elif start == "b":
-                    s = "Black"
+        with open(os.path.join(folder, file), 'rb', buffering=FILE_BUFFER) as f:
+            for line in f:
+                if len(line.strip()) == 0:
+                    continue
+                # Each puzzle is a title line followed by fen and solution lines
+                fen = next(f).strip()
+                sol = next(f).strip()
+                start = fen.split(b" ")[1]
+                if start == b"w":
+                    s = b"White"
+                elif start == b"b":
+                    s = b"Black"
                 else:
-                    print("Error reading start side: %s, fen = %s" % (start, fen))
-                    i += 3
+                    print("Error reading start side: %s, fen = %s" % (start.decode(), fen.decode()))
                     continue
-                puzzles += "%d %s Mates in %d\n%s\n%s\n\n" % (id, s, m+2, fen, context[i+2].strip())
+                puzzles.append(b"%d %s Mates in %d\n%s\n%s\n\n" % (id, s, m+2, fen, sol))
                 id += 1
-                i += 3
         print(file + " completed.")
-    fw.write(puzzles)
-    fw.close()
+    with open(os.path.join(folder, target), 'wb', buffering=FILE_BUFFER) as fw:
+        fw.writelines(puzzles)
     print("Done")
 
 def process_5334():
@@ -41,86 +47,75 @@ def process_5334():
     solution = "polgar_5334_solution.txt"
     folder = 'E:\Workshop\project\RenChess\data'
     target = "polgar_5334.txt"
-    game = ""
-    fp = open(os.path.join(folder, problems), 'r')
-    fs = open(os.path.join(folder, solution), 'r')
-    fw = open(os.path.join(folder, target), 'w')
-    puzzles = ""
+    game = b""
+    puzzles = []
 
-    problem_context = fp.readlines()
-    solution_context = fs.readlines()
-    ip, isol, index = 0, 0, 0
-    while ip < len(problem_context):
-        line = problem_context[ip]
-        if line.startswith("[White "):
+    with open(os.path.join(folder, problems), 'rb', buffering=FILE_BUFFER) as fp, \
+            open(os.path.join(folder, solution), 'rb', buffering=FILE_BUFFER) as fs:
+        for line in fp:
             # [White "4212 Black Mate in Three"]
             # [White "White Endgame to Draw 5069"]
-            game = " ".join(line[1:-1].split(" ")[1:])[1:-1]
-            if game[-1] == "\"":
-                game = game[:-1]
-        elif line.startswith("[FEN "):
-            fen = " ".join(line[1:-1].split(" ")[1:])[1:-2]
-            items = game.split(" ")
-            if game[0].isdigit():
-                id = int(items[0])
-                game = " ".join([str(id)] + items[1:])
-            else:
-                id = int(items[-1])
-                game = " ".join([items[-1]] + items[:-1])
-            sol = solution_context[index].split(" ")
-            index += 1
-            if id > 1 and int(sol[0]) != id:
-                print("Problem index don't match: %s\nSolution=%s" % (game, " ".join(sol)))
-                ip += 1
+            m = WHITE_TAG_RE.match(line)
+            if m:
+                game = m.group(1)
                 continue
-            puzzles += "%s\n%s\n%s\n\n" % (game, fen, " ".join(sol[1:]))
-        ip += 1
-    fw.write(puzzles)
-    fw.close()
+            m = FEN_TAG_RE.match(line)
+            if m:
+                fen = m.group(1)
+                items = game.split(b" ")
+                if game[:1].isdigit():
+                    id = int(items[0])
+                    game = b" ".join([b"%d" % id] + items[1:])
+                else:
+                    id = int(items[-1])
+                    game = b" ".join([items[-1]] + items[:-1])
+                sol = next(fs).split(b" ")
+                if id > 1 and int(sol[0]) != id:
+                    print("Problem index don't match: %s\nSolution=%s" % (game.decode(), b" ".join(sol).decode()))
+                    continue
+                puzzles.append(b"%s\n%s\n%s\n\n" % (game, fen, b" ".join(sol[1:])))
+    with open(os.path.join(folder, target), 'wb', buffering=FILE_BUFFER) as fw:
+        fw.writelines(puzzles)
     print("Done")
 
 def clean_5334():
     puzzle = "polgar_5334.txt"
     target = "polgar_5334_2.txt"
     folder = 'E:\Workshop\project\RenChess\data'
-    fp = open(os.path.join(folder, puzzle), 'r')
-    fw = open(os.path.join(folder, target), 'w')
-    puzzle_context = fp.readlines()
-    results = ""
-    i = 0
-    for line in puzzle_context:
-        for c in line:
-            o = ord(c)
-            if o > 31 and o < 127:
-                results += c
-        results += "\n"
-    fw.write(results)
-    fw.close()
+    with open(os.path.join(folder, puzzle), 'rb') as fp:
+        data = fp.read().translate(None, NON_PRINTABLE)
+    if data and not data.endswith(b"\n"):
+        data += b"\n"
+    with open(os.path.join(folder, target), 'wb') as fw:
+        fw.write(data)
     print("Done")
 
 def check_5334():
     puzzle = "polgar_5334.txt"
     folder = 'E:\Workshop\project\RenChess\data'
-    fp = open(os.path.join(folder, puzzle), 'r')
-    puzzle_context = fp.readlines()
-    i = 0
     id = 0
-    while i < len(puzzle_context) - 3:
-        try:
-            id = int(puzzle_context[i].split(" ")[0])
-        except:
-            print("Error in puzzle %d: %s" % (id, puzzle_context[i]))
-            break
-        if len(puzzle_context[i+1].strip()) == 0:
-            print("Error in puzzle %d: %s" % (id, puzzle_context[i+1]))
-            break
-        if puzzle_context[i+2][0] != '1':
-            print("Error in puzzle %d: %s" % (id, puzzle_context[i+2]))
-            break
-        if len(puzzle_context[i+3].strip()) > 0:
-            print("Error in space line under puzzle %d" % id)
-            break
-        i += 4
+    with open(os.path.join(folder, puzzle), 'rb', buffering=FILE_BUFFER) as fp:
+        # Puzzles are 4 line records: id/title, fen, solution, blank
+        for n, line in enumerate(fp):
+            phase = n % 4
+            if phase == 0:
+                try:
+                    id = int(line.split(b" ", 1)[0])
+                except:
+                    print("Error in puzzle %d: %s" % (id, line.decode(errors='replace')))
+                    break
+            elif phase == 1:
+                if len(line.strip()) == 0:
+                    print("Error in puzzle %d: %s" % (id, line.decode(errors='replace')))
+                    break
+            elif phase == 2:
+                if line[:1] != b'1':
+                    print("Error in puzzle %d: %s" % (id, line.decode(errors='replace')))
+                    break
+            elif len(line.strip()) > 0:
+                print("Error in space line under puzzle %d" % id)
+                break
     print("Done")
 
-check_5334()
\ No newline at end of file
+if __name__ == "__main__":
+    check_5334()
\ No newline at end of file
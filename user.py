@@ -3,54 +3,82 @@ import time
 import configparser
 import heapq
 
+# Review interval in days for each puzzle stage
+MEMORY_CURVE = (1, 2, 3, 5, 8, 13, 21)
+
+# Puzzle record days are counted from 2021/01/01
+RECORD_EPOCH = 1609488000
+
+def record_day():
+    """ Returns the number of days since RECORD_EPOCH """
+    return (int(time.time()) - RECORD_EPOCH) // 86400
+
+def parse_entries(entries):
+    """ Returns {puzzle_id: (days, stage)} from an "id:days,stage;..." record line """
+    records = {}
+    for entry in entries.split(";"):
+        if entry:
+            item, value = entry.split(":")
+            days, stage = value.split(",")
+            records[item] = (int(days), int(stage))
+    return records
+
+def format_entries(records):
+    """ Returns the "id:days,stage;..." record line of {puzzle_id: (days, stage)} """
+    return ";".join("%s:%d,%d" % (item, days, stage) for item, (days, stage) in records.items())
+
 class User:
     def __init__(self):
+        data_folder = os.path.join(os.getcwd(), "data")
+        self.user_file = os.path.join(data_folder, "user.ini")
+        self.record_file = os.path.join(data_folder, "record.txt")
         self.config = configparser.ConfigParser()
-        user_file = os.path.join(os.getcwd(), "data\\user.ini")
-        self.config.read(user_file)
-        self.record = configparser.ConfigParser()
-        record_file = os.path.join(os.getcwd(), "data\\record.txt")
-        self.record.read(record_file)
+        self.config.read(self.user_file)
+        record = configparser.ConfigParser()
+        record.read(self.record_file)
+        # Records are kept parsed as {puzzle_set: {puzzle_id: (days, stage)}}
+        self.record = {}
+        for section, items in record.items():
+            if section == configparser.DEFAULTSECT:
+                continue
+            if "entries" in items:
+                self.record[section] = parse_entries(items["entries"])
+            else:
+                # Older record files have one "id = days stage" key per puzzle
+                self.record[section] = {item: tuple(map(int, value.split(" ")))
+                                        for item, value in items.items()}
 
     def add_activity(self, puzzle_set, puzzle_id, result):
         id_str = str(puzzle_id)
-        days = int((time.time() - 1609488000) / 86400)   # number of days since 2021/01/01
-        if puzzle_set not in self.record:
-            self.record[puzzle_set] = {id_str: str(days) + " 0"}
-        elif id_str not in self.record[puzzle_set]:
-            self.record[puzzle_set][id_str] = str(days) + " 0"
+        days = record_day()
+        records = self.record.setdefault(puzzle_set, {})
+        if id_str not in records:
+            records[id_str] = (days, 0)
         else:
-            old_stage = int(self.record[puzzle_set][id_str].split(" ")[1])
+            old_stage = records[id_str][1]
             # Go to next stage if S rank is cleared. Otherwise go back to previous stage
             new_stage = old_stage + 1 if result == "S" else max(old_stage - 1, 0)
             if new_stage < 7:
-                self.record[puzzle_set][id_str] = str(days) + " " + str(new_stage)
+                records[id_str] = (days, new_stage)
             else:
-                self.record[puzzle_set].pop(id_str)
+                records.pop(id_str)
 
     def save_files(self):
-        user_file = os.path.join(os.getcwd(), "data\\user.ini")
-        with open(user_file, 'w') as configfile:
+        with open(self.user_file, 'w') as configfile:
             self.config.write(configfile)
-        record_file = os.path.join(os.getcwd(), "data\\record.txt")
-        with open(record_file, 'w') as recordfile:
-            self.record.write(recordfile)
+        record = configparser.ConfigParser()
+        # One line per puzzle set keeps record.txt small and quick to parse
+        record.read_dict({section: {"entries": format_entries(items)}
+                          for section, items in self.record.items()})
+        with open(self.record_file, 'w') as recordfile:
+            record.write(recordfile)
 
     def get_review_items(self):
-        memory_curve = {0: 1, 1: 2, 2: 3, 3: 5, 4: 8, 5: 13, 6: 21}
-        today = int((time.time() - 1609488000) / 86400)   # number of days since 2021/01/01
-        review_items = []
+        today = record_day()
         max_item = int(self.config["User"]["max_review_items"])
-        for section in self.record:
-            for item in self.record[section]:
-                records = self.record[section][item].split(" ")
-                days, stage = int(records[0]), int(records[1])
-                # review lower stage first. In the same stage, review older puzzle first
-                idx = -1000 * memory_curve[stage] + (today - days)
-                if len(review_items) < max_item:
-                    heapq.heappush(review_items, (idx, section, item))
-                elif idx > review_items[0][0]:
-                    heapq.heapreplace(review_items, (idx, section, item))
-        results = [heapq.heappop(review_items)[1:] for _ in range(len(review_items))]
-        return results[::-1]    # reverse order
+        # review lower stage first. In the same stage, review older puzzle first
+        scored = ((-1000 * MEMORY_CURVE[stage] + (today - days), section, item)
+                  for section, items in self.record.items()
+                  for item, (days, stage) in items.items())
+        return [(section, item) for _, section, item in heapq.nlargest(max_item, scored)]
         